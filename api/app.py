@@ -2,18 +2,39 @@
 Flask application for the schedule assignment API.
 """
 from flask import Flask, render_template
-from pathlib import Path
-import sys
+from flask.json.provider import JSONProvider
+import orjson
 
-# Add src to path
-sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from api.endpoints import assign_cell_get, assign_cell_post, invalidate_cache, _load_and_cache_data
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson (serializes numpy scalars natively)."""
+
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response (skips str round-trip)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=self.option), mimetype='application/json')
 
-from endpoints import assign_cell
 
 app = Flask(__name__, template_folder='templates')
+app.json = OrjsonProvider(app)
 
 # Register routes
-app.add_url_rule('/assign', 'assign_cell', assign_cell, methods=['GET', 'POST'])
+app.add_url_rule('/assign', 'assign_cell_get', assign_cell_get, methods=['GET'])
+app.add_url_rule('/assign', 'assign_cell_post', assign_cell_post, methods=['POST'])
+app.add_url_rule('/cache/invalidate', 'invalidate_cache', invalidate_cache, methods=['POST'])
+
+# Warm the data cache at startup so the first /assign request doesn't pay for it
+_load_and_cache_data()
 
 @app.route('/', methods=['GET'])
 def index():
@@ -38,6 +59,7 @@ if __name__ == '__main__':
     print("  GET      /                    - Web test interface")
     print("  GET/POST /assign              - Assign a cell")
     print("  GET      /health              - Health check")
+    print("  POST     /cache/invalidate    - Rebuild cached data (X-Admin-Token, needs CACHE_ADMIN_TOKEN)")
     print(f"\nExample request:")
     print(f"  curl 'http://localhost:{PORT}/assign?schedule_detail_id=8849241&day_num=1'")
     print("=" * 60)
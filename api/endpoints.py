@@ -2,144 +2,283 @@
 API endpoints for schedule assignment.
 """
 from flask import jsonify, request
-import pandas as pd
 from pathlib import Path
-import sys
+import functools
+import hmac
+import os
+import shutil
+import tempfile
+import pandas as pd
+
+from src.data_loader import load_schedule_data, split_historical_and_latest, data_fingerprint, clear_data_cache
+from src.preprocessing import preprocess_schedule
+from src.compute_employee_profile import compute_compatibility, build_profile_matrix
+from src.optimizer import solve_assignment, clear_compatibility_cache
+
+# Date of the latest schedule snapshot (the one being filled)
+TARGET_DATE = "10/8/2024"
+
+DATA_PATH = "data/Schedule_Historical_Data.csv"
+
+# On-disk cache of computed profiles and the preprocessed latest snapshot,
+# anchored to the project (not the working directory), one subdirectory per
+# CSV content hash and cache schema version
+CACHE_DIR = Path(__file__).resolve().parent.parent / ".cache" / "schedule_profiles"
+
+# Bump whenever the cached profile/snapshot columns or dtypes change, so files
+# written by an older build are not reused
+CACHE_SCHEMA_VERSION = 2
+
+# Shared secret required (X-Admin-Token header) by POST /cache/invalidate;
+# the endpoint is disabled when unset
+CACHE_ADMIN_TOKEN = os.environ.get("CACHE_ADMIN_TOKEN")
+
+# Accepted spellings of each request parameter, tried in order
+_SCHEDULE_DETAIL_ID_KEYS = ('schedule_detail_id', 'ScheduleDetailID')
+_DAY_NUM_KEYS = ('day_num', 'DayNum')
+
 
-# Add src to path
-sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+def _first_param(source, keys):
+    """Return the value of the first key present in source, or None."""
+    for key in keys:
+        value = source.get(key)
+        if value is not None:
+            return value
+    return None
 
-from data_loader import load_schedule_data, split_historical_and_latest
-from preprocessing import preprocess_schedule
-from compute_employee_profile import compute_compatibility
-from optimizer import solve_assignment
 
-# Cache for loaded data
-_data_cache = None
-_employee_profiles_cache = None
-_latest_snapshot_cache = None
+def _compute_profiles_and_latest(fingerprint: str):
+    """Run the full load/preprocess/profile pipeline on the CSV with the given content hash."""
+    df = load_schedule_data(DATA_PATH, target_date=TARGET_DATE, fingerprint=fingerprint)
+    historical_data, latest_snapshot = split_historical_and_latest(df, target_date=TARGET_DATE)
+    
+    # Preprocess
+    processed_historical = preprocess_schedule(historical_data, deduplicate_by_date=True)
+    processed_latest = preprocess_schedule(latest_snapshot, deduplicate_by_date=True)
+    
+    # Compute employee profiles
+    employee_profiles = compute_compatibility(processed_historical)
+    
+    return employee_profiles, processed_latest.reset_index(drop=True)
+
+
+def _write_cache_entry(cache_dir: Path, employee_profiles: pd.DataFrame, processed_latest: pd.DataFrame):
+    """
+    Write a profile cache entry atomically.
+    
+    Both files are written into a temporary sibling directory that is then
+    renamed to cache_dir, so readers never see a partial entry.
+    """
+    cache_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=cache_dir.parent, prefix=f'.{cache_dir.name}.'))
+    try:
+        employee_profiles.to_parquet(tmp_dir / 'profiles.parquet', index=False)
+        processed_latest.to_feather(tmp_dir / 'latest_snapshot.feather')
+        try:
+            os.replace(tmp_dir, cache_dir)
+        except OSError:
+            # Another process already published this entry
+            if not cache_dir.is_dir():
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
 
 
+@functools.lru_cache(maxsize=1)
 def _load_and_cache_data():
-    """Load and cache data for API requests."""
-    global _data_cache, _employee_profiles_cache, _latest_snapshot_cache
+    """Load and cache data for API requests (computed once per process)."""
+    fingerprint = data_fingerprint(DATA_PATH)
+    cache_dir = CACHE_DIR / f"v{CACHE_SCHEMA_VERSION}-{TARGET_DATE.replace('/', '-')}-{fingerprint}"
+    profiles_path = cache_dir / 'profiles.parquet'
+    latest_path = cache_dir / 'latest_snapshot.feather'
     
-    if _data_cache is None:
+    if profiles_path.exists() and latest_path.exists():
+        print(f"Loading cached data from {cache_dir}...")
+        employee_profiles = pd.read_parquet(profiles_path)
+        processed_latest = pd.read_feather(latest_path)
+    else:
         print("Loading and caching data...")
-        # Load data
-        df = load_schedule_data()
-        historical_data, latest_snapshot = split_historical_and_latest(df, target_date="10/8/2024")
-        
-        # Preprocess
-        processed_historical = preprocess_schedule(historical_data, deduplicate_by_date=True)
-        processed_latest = preprocess_schedule(latest_snapshot, deduplicate_by_date=True)
-        
-        # Compute employee profiles
-        employee_profiles = compute_compatibility(processed_historical)
-        
-        # Cache
-        _data_cache = {
-            'historical': processed_historical,
-            'latest': processed_latest
-        }
-        _employee_profiles_cache = employee_profiles
-        _latest_snapshot_cache = processed_latest.copy()
-        print(f"✓ Data cached: {len(_latest_snapshot_cache)} shifts, {len(_employee_profiles_cache)} employees")
+        employee_profiles, processed_latest = _compute_profiles_and_latest(fingerprint)
+        try:
+            _write_cache_entry(cache_dir, employee_profiles, processed_latest)
+        except OSError as e:
+            print(f"Warning: could not write data cache {cache_dir}: {e}")
+    
+    # Dense profile matrix so per-request scoring is a matrix-vector product
+    profile_matrix = build_profile_matrix(employee_profiles)
+    
+    # (ScheduleDetailID, DayNum) -> row position, for O(1) cell lookups
+    cell_index = dict(zip(
+        zip(processed_latest['ScheduleDetailID'].astype(int), processed_latest['DayNum'].astype(int)),
+        range(len(processed_latest))
+    ))
+    
+    # Filled shifts never change between requests; solve_assignment only reads them
+    is_filled = processed_latest['EmployeeNumber'].notna().to_numpy()
+    filled_shifts = processed_latest[is_filled]
+    
+    print(f"✓ Data cached: {len(processed_latest)} shifts, {len(employee_profiles)} employees")
+    
+    return employee_profiles, processed_latest, profile_matrix, cell_index, filled_shifts, is_filled
+
+
+def invalidate_cache():
+    """
+    API endpoint to drop the on-disk and in-memory data caches (including
+    memoized compatibility scores) and rebuild them from the CSV.
+    
+    Requires the X-Admin-Token header to match CACHE_ADMIN_TOKEN; disabled when
+    that is unset. Only CACHE_DIR and the CSV's parquet sidecars are removed, and
+    the rebuild runs in this request rather than in a later /assign. Under
+    Gunicorn only the handling worker is rebuilt; the other workers keep their
+    in-memory copy until Gunicorn is restarted.
+    
+    Returns:
+        JSON response confirming the rebuild
+    """
+    if not CACHE_ADMIN_TOKEN:
+        return jsonify({
+            'error': 'Cache invalidation is disabled',
+            'message': 'Set CACHE_ADMIN_TOKEN to enable it'
+        }), 403
+    
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode(), CACHE_ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Invalid or missing X-Admin-Token'}), 401
+    
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    clear_data_cache(DATA_PATH)
+    _load_and_cache_data.cache_clear()
+    clear_compatibility_cache()
+    
+    # Rebuild now so no /assign request pays for the full pipeline
+    try:
+        employee_profiles, latest_snapshot = _load_and_cache_data()[:2]
+    except Exception as e:
+        return jsonify({
+            'error': 'Cache rebuild failed',
+            'message': str(e)
+        }), 500
+    
+    return jsonify({
+        'status': 'rebuilt',
+        'shifts': len(latest_snapshot),
+        'employees': len(employee_profiles)
+    }), 200
+
+
+def assign_cell_get():
+    """
+    GET /assign: assign an employee to a schedule cell.
+    
+    Query parameters:
+        schedule_detail_id (int): ScheduleDetailID of the cell
+        day_num (int): DayNum of the cell (1-7)
     
-    return _data_cache, _employee_profiles_cache, _latest_snapshot_cache
+    Returns:
+        JSON response with assignment information
+    """
+    return _do_assign(
+        _first_param(request.args, _SCHEDULE_DETAIL_ID_KEYS),
+        _first_param(request.args, _DAY_NUM_KEYS)
+    )
 
 
-def assign_cell():
+def assign_cell_post():
     """
-    API endpoint to assign an employee to a schedule cell.
+    POST /assign: assign an employee to a schedule cell.
     
-    Query parameters (GET) or JSON body (POST):
+    JSON body (or form fields):
         schedule_detail_id (int): ScheduleDetailID of the cell
         day_num (int): DayNum of the cell (1-7)
     
     Returns:
         JSON response with assignment information
     """
+    # Only a JSON object carries named parameters; anything else falls back to form fields
+    source = request.get_json(silent=True)
+    if not isinstance(source, dict) or not source:
+        source = request.form
+    return _do_assign(
+        _first_param(source, _SCHEDULE_DETAIL_ID_KEYS),
+        _first_param(source, _DAY_NUM_KEYS)
+    )
+
+
+def _do_assign(schedule_detail_id, day_num):
+    """
+    Validate the requested cell and return its existing or optimized assignment.
+    
+    Args:
+        schedule_detail_id: Raw ScheduleDetailID parameter (None if missing)
+        day_num: Raw DayNum parameter (None if missing)
+    
+    Returns:
+        JSON response with assignment information
+    """
+    # Validate parameters
+    if schedule_detail_id is None or day_num is None:
+        return jsonify({
+            'error': 'Missing required parameters',
+            'required': ['schedule_detail_id', 'day_num']
+        }), 400
+    
+    try:
+        schedule_detail_id = int(schedule_detail_id)
+        day_num = int(day_num)
+    except (TypeError, ValueError):
+        return jsonify({
+            'error': 'Invalid parameter types',
+            'schedule_detail_id': 'must be integer',
+            'day_num': 'must be integer (1-7)'
+        }), 400
+    
+    if day_num < 1 or day_num > 7:
+        return jsonify({
+            'error': 'Invalid day_num',
+            'day_num': f'{day_num} is not valid (must be 1-7)'
+        }), 400
+    
     try:
-        # Get parameters
-        if request.method == 'POST':
-            data = request.get_json() or {}
-            schedule_detail_id = data.get('schedule_detail_id') or data.get('ScheduleDetailID')
-            day_num = data.get('day_num') or data.get('DayNum')
-        else:  # GET
-            schedule_detail_id = request.args.get('schedule_detail_id') or request.args.get('ScheduleDetailID')
-            day_num = request.args.get('day_num') or request.args.get('DayNum')
-        
-        # Validate parameters
-        if schedule_detail_id is None or day_num is None:
-            return jsonify({
-                'error': 'Missing required parameters',
-                'required': ['schedule_detail_id', 'day_num']
-            }), 400
-        
-        try:
-            schedule_detail_id = int(schedule_detail_id)
-            day_num = int(day_num)
-        except ValueError:
-            return jsonify({
-                'error': 'Invalid parameter types',
-                'schedule_detail_id': 'must be integer',
-                'day_num': 'must be integer (1-7)'
-            }), 400
-        
-        if day_num < 1 or day_num > 7:
-            return jsonify({
-                'error': 'Invalid day_num',
-                'day_num': f'{day_num} is not valid (must be 1-7)'
-            }), 400
-        
         # Load cached data
-        _, employee_profiles, latest_snapshot = _load_and_cache_data()
+        (employee_profiles, latest_snapshot, profile_matrix,
+         cell_index, filled_shifts, is_filled) = _load_and_cache_data()
         
         # Find the cell in the latest snapshot
-        cell_mask = (
-            (latest_snapshot['ScheduleDetailID'] == schedule_detail_id) &
-            (latest_snapshot['DayNum'] == day_num)
-        )
-        cell_rows = latest_snapshot[cell_mask]
+        row_idx = cell_index.get((schedule_detail_id, day_num))
         
-        if len(cell_rows) == 0:
+        if row_idx is None:
             return jsonify({
                 'error': 'Cell not found',
-                'schedule_detail_id': int(schedule_detail_id),
-                'day_num': int(day_num)
+                'schedule_detail_id': schedule_detail_id,
+                'day_num': day_num
             }), 404
         
-        # Get the first row (should be only one after deduplication)
-        cell = cell_rows.iloc[0]
-        
-        # Check if cell is already filled
-        if pd.notna(cell['EmployeeNumber']):
+        # Check if cell is already filled (one row per cell after deduplication)
+        if is_filled[row_idx]:
             return jsonify({
                 'status': 'filled',
-                'schedule_detail_id': int(schedule_detail_id),
-                'day_num': int(day_num),
-                'employee_number': int(cell['EmployeeNumber']),
+                'schedule_detail_id': schedule_detail_id,
+                'day_num': day_num,
+                # EmployeeNumber is a nullable column (NA marks unfilled); send a plain int
+                'employee_number': int(latest_snapshot['EmployeeNumber'].iat[row_idx]),
                 'source': 'existing_schedule',
                 'message': 'Cell is already filled in the dataset'
             }), 200
         
         # Cell is unfilled - run on-demand assignment
         # Get only this specific unfilled shift
-        unfilled_shift = cell_rows.iloc[0:1].copy()
-        
-        # Get all filled shifts for constraint checking
-        filled_shifts = latest_snapshot[latest_snapshot['EmployeeNumber'].notna()].copy()
+        unfilled_shift = latest_snapshot.iloc[row_idx:row_idx + 1].copy()
         
-        # Solve assignment for this single shift
-        assignments = solve_assignment(unfilled_shift, employee_profiles, filled_shifts)
+        # Solve assignment for this single shift (cached filled shifts drive constraint checks)
+        assignments = solve_assignment(unfilled_shift, employee_profiles, filled_shifts, profile_matrix)
         
         if len(assignments) == 0:
             # No feasible assignment found
             return jsonify({
                 'status': 'unfilled',
-                'schedule_detail_id': int(schedule_detail_id),
-                'day_num': int(day_num),
+                'schedule_detail_id': schedule_detail_id,
+                'day_num': day_num,
                 'employee_number': None,
                 'source': 'optimization',
                 'message': 'Cell is unfilled and no feasible assignment found (constraints cannot be satisfied)'
@@ -148,14 +287,13 @@ def assign_cell():
         # Get the assigned employee
         shift_id = (schedule_detail_id, day_num)
         if shift_id in assignments:
+            # numpy int64 is serialized natively by the orjson provider
             assigned_employee = assignments[shift_id]
-            # Convert to native Python int (handles numpy int64)
-            assigned_employee = int(assigned_employee)
             
             return jsonify({
                 'status': 'assigned',
-                'schedule_detail_id': int(schedule_detail_id),
-                'day_num': int(day_num),
+                'schedule_detail_id': schedule_detail_id,
+                'day_num': day_num,
                 'employee_number': assigned_employee,
                 'source': 'optimization',
                 'message': 'Cell was unfilled and employee assigned via optimization'
@@ -164,8 +302,8 @@ def assign_cell():
             # Assignment didn't include this shift (shouldn't happen)
             return jsonify({
                 'status': 'unfilled',
-                'schedule_detail_id': int(schedule_detail_id),
-                'day_num': int(day_num),
+                'schedule_detail_id': schedule_detail_id,
+                'day_num': day_num,
                 'employee_number': None,
                 'source': 'optimization',
                 'message': 'Cell is unfilled but was not assigned in optimization solution'
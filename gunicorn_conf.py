@@ -0,0 +1,19 @@
+"""
+Gunicorn configuration for the schedule assignment API.
+
+Usage (from the project root):
+    gunicorn -c gunicorn_conf.py
+"""
+
+wsgi_app = 'api.app:app'
+
+bind = '0.0.0.0:5001'
+workers = 4
+
+# Import the app (and warm the data cache) once in the master process;
+# forked workers share the cached DataFrames copy-on-write
+preload_app = True
+
+# POST /cache/invalidate rebuilds the data cache inside the request; allow it
+# more than the default 30 s before the worker is killed
+timeout = 120
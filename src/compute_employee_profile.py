@@ -3,9 +3,35 @@ Pattern learning module for extracting employee shift preferences from historica
 """
 import pandas as pd
 import numpy as np
-from typing import Dict
-from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
 from collections import defaultdict
+from src.preprocessing import shift_duration_hours
+
+# Weight of each preference dimension in the compatibility score
+COMPATIBILITY_WEIGHTS = {
+    'day': 0.3,
+    'time': 0.25,
+    'duration': 0.15,
+    'job': 0.2,
+    'shift_type': 0.1
+}
+
+# Preference dimensions: (shift column, profile column prefix, weight key)
+PROFILE_DIMENSIONS = [
+    ('DayNum', 'Day', 'day'),
+    ('ShiftTimeCategory', 'Time_', 'time'),
+    ('ShiftDurationCategory', 'Duration_', 'duration'),
+    ('JobNumber', 'Job_', 'job'),
+    ('ShiftType', 'ShiftType_', 'shift_type')
+]
+
+# COMPATIBILITY_WEIGHTS as an array aligned with PROFILE_DIMENSIONS
+DIMENSION_WEIGHTS = np.array([COMPATIBILITY_WEIGHTS[key] for _, _, key in PROFILE_DIMENSIONS], dtype=np.float64)
+
+# Fixed category sets for shift features (ShiftType is every time/duration pair)
+SHIFT_TIME_CATEGORIES = ['morning', 'afternoon', 'evening', 'night']
+SHIFT_DURATION_CATEGORIES = ['short', 'medium', 'long']
+SHIFT_TYPE_CATEGORIES = [f'{t}_{d}' for t in SHIFT_TIME_CATEGORIES for d in SHIFT_DURATION_CATEGORIES]
 
 
 def extract_shift_features(df: pd.DataFrame) -> pd.DataFrame:
@@ -20,50 +46,31 @@ def extract_shift_features(df: pd.DataFrame) -> pd.DataFrame:
     """
     df = df.copy()
     
-    # Parse shift times if not already done
-    if 'ShiftStartTime_parsed' not in df.columns:
-        df['ShiftStartTime_parsed'] = pd.to_datetime(df['ShiftStartTime'], format='%H:%M:%S').dt.time
-    
-    # Categorize shift start times
-    def categorize_shift_time(start_time):
-        hour = start_time.hour
-        if 6 <= hour < 12:
-            return 'morning'
-        elif 12 <= hour < 18:
-            return 'afternoon'
-        elif 18 <= hour < 22:
-            return 'evening'
-        else:
-            return 'night'
-    
-    df['ShiftTimeCategory'] = df['ShiftStartTime_parsed'].apply(categorize_shift_time)
+    # Categorize shift start times by hour
+    hour = pd.to_datetime(df['ShiftStartTime'], format='%H:%M:%S').dt.hour.to_numpy()
+    time_codes = np.select(
+        [hour < 6, hour < 12, hour < 18, hour < 22],
+        [3, 0, 1, 2],  # night, morning, afternoon, evening
+        default=3
+    ).astype(np.int8)
+    df['ShiftTimeCategory'] = pd.Categorical.from_codes(time_codes, categories=SHIFT_TIME_CATEGORIES)
     
     # Categorize shift duration
     if 'ShiftDurationHours' not in df.columns:
         # Calculate if not present
-        def calculate_hours(row):
-            start = pd.to_datetime(row['ShiftStartTime'], format='%H:%M:%S').time()
-            end = pd.to_datetime(row['ShiftEndTime'], format='%H:%M:%S').time()
-            start_dt = datetime.combine(datetime.today(), start)
-            end_dt = datetime.combine(datetime.today(), end)
-            if end_dt < start_dt:
-                end_dt += timedelta(days=1)
-            return (end_dt - start_dt).total_seconds() / 3600
-        
-        df['ShiftDurationHours'] = df.apply(calculate_hours, axis=1)
+        df['ShiftDurationHours'] = shift_duration_hours(df['ShiftStartTime'], df['ShiftEndTime'])
     
-    def categorize_duration(hours):
-        if hours <= 6:
-            return 'short'
-        elif hours <= 10:
-            return 'medium'
-        else:
-            return 'long'
+    hours = df['ShiftDurationHours'].to_numpy()
+    duration_codes = np.select(
+        [hours <= 6, hours <= 10],
+        [0, 1],  # short, medium
+        default=2
+    ).astype(np.int8)
+    df['ShiftDurationCategory'] = pd.Categorical.from_codes(duration_codes, categories=SHIFT_DURATION_CATEGORIES)
     
-    df['ShiftDurationCategory'] = df['ShiftDurationHours'].apply(categorize_duration)
-    
-    # Create shift type identifier
-    df['ShiftType'] = df['ShiftTimeCategory'] + '_' + df['ShiftDurationCategory']
+    # Create shift type identifier from the two category codes (no string concatenation)
+    shift_type_codes = time_codes * len(SHIFT_DURATION_CATEGORIES) + duration_codes
+    df['ShiftType'] = pd.Categorical.from_codes(shift_type_codes, categories=SHIFT_TYPE_CATEGORIES)
     
     return df
 
@@ -91,131 +98,107 @@ def compute_compatibility(historical_data: pd.DataFrame) -> pd.DataFrame:
     # Extract features
     filled_shifts = extract_shift_features(filled_shifts)
     
-    # Get all unique employees
-    unique_employees = filled_shifts['EmployeeNumber'].dropna().unique()
-    
-    # Get all unique values for each dimension
-    all_days = sorted(filled_shifts['DayNum'].unique())
-    all_times = sorted(filled_shifts['ShiftTimeCategory'].unique())
-    all_durations = sorted(filled_shifts['ShiftDurationCategory'].unique())
-    all_jobs = sorted(filled_shifts['JobNumber'].unique())
-    all_shift_types = sorted(filled_shifts['ShiftType'].unique())
+    # Per-employee distribution along each preference dimension, one
+    # normalized crosstab per dimension
+    employees = filled_shifts['EmployeeNumber'].astype(int)
+    total_shifts = employees.value_counts().sort_index()
+    
+    prob_frames = []
+    for col, prefix, _ in PROFILE_DIMENSIONS:
+        # crosstab orders columns by value (category order for categoricals) and
+        # drops unobserved categories, so only seen features get a column
+        probs = pd.crosstab(employees, filled_shifts[col], normalize='index')
+        probs = probs.reindex(total_shifts.index)
+        probs.columns = [f'{prefix}{value}_Prob' for value in probs.columns]
+        prob_frames.append(probs)
+    
+    # Create DataFrame (EmployeeNumber, TotalShifts, then per-dimension probabilities)
+    profiles_df = pd.concat([total_shifts.rename('TotalShifts')] + prob_frames, axis=1)
+    profiles_df.index.name = 'EmployeeNumber'
+    profiles_df = profiles_df.reset_index()
     
-    # Initialize employee profiles
-    employee_profiles = []
+    return profiles_df
+
+
+def build_profile_matrix(
+    employee_profiles: pd.DataFrame
+) -> Tuple[np.ndarray, Dict[int, int], Dict[str, int]]:
+    """
+    Materialize employee profiles as a dense float32 matrix for vectorized scoring.
     
-    for emp_num in unique_employees:
-        emp_shifts = filled_shifts[filled_shifts['EmployeeNumber'] == emp_num]
-        total_shifts = len(emp_shifts)
-        
-        if total_shifts == 0:
-            continue
-        
-        # Count preferences
-        day_counts = emp_shifts['DayNum'].value_counts().to_dict()
-        time_counts = emp_shifts['ShiftTimeCategory'].value_counts().to_dict()
-        duration_counts = emp_shifts['ShiftDurationCategory'].value_counts().to_dict()
-        job_counts = emp_shifts['JobNumber'].value_counts().to_dict()
-        shift_type_counts = emp_shifts['ShiftType'].value_counts().to_dict()
-        
-        # Normalize to probabilities
-        day_probs = {day: day_counts.get(day, 0) / total_shifts for day in all_days}
-        time_probs = {time: time_counts.get(time, 0) / total_shifts for time in all_times}
-        duration_probs = {dur: duration_counts.get(dur, 0) / total_shifts for dur in all_durations}
-        job_probs = {job: job_counts.get(job, 0) / total_shifts for job in all_jobs}
-        shift_type_probs = {st: shift_type_counts.get(st, 0) / total_shifts for st in all_shift_types}
-        
-        # Create profile row
-        profile = {
-            'EmployeeNumber': int(emp_num),
-            'TotalShifts': total_shifts
-        }
-        
-        # Add day preferences (Day1, Day2, ..., Day7)
-        for day in all_days:
-            profile[f'Day{day}_Prob'] = day_probs[day]
-        
-        # Add time preferences
-        for time_cat in all_times:
-            profile[f'Time_{time_cat}_Prob'] = time_probs[time_cat]
-        
-        # Add duration preferences
-        for dur_cat in all_durations:
-            profile[f'Duration_{dur_cat}_Prob'] = duration_probs[dur_cat]
-        
-        # Add job preferences
-        for job in all_jobs:
-            profile[f'Job_{job}_Prob'] = job_probs[job]
-        
-        # Add shift type preferences
-        for shift_type in all_shift_types:
-            # Replace special characters for column name
-            col_name = f'ShiftType_{shift_type.replace("_", "_")}_Prob'
-            profile[col_name] = shift_type_probs[shift_type]
+    Args:
+        employee_profiles: DataFrame with employee profiles (from compute_compatibility)
         
-        employee_profiles.append(profile)
+    Returns:
+        Tuple of (profile_matrix, employee_index, feature_index):
+        - profile_matrix: array of shape (n_employees, n_features), rows in profile order
+        - employee_index: EmployeeNumber -> row in profile_matrix
+        - feature_index: preference column name -> column in profile_matrix
+    """
+    feature_cols: List[str] = [col for col in employee_profiles.columns if col.endswith('_Prob')]
+    # C-contiguous: the scoring kernels walk one employee row at a time
+    profile_matrix = np.ascontiguousarray(employee_profiles[feature_cols].to_numpy(dtype=np.float32))
+    employee_index = {int(emp): i for i, emp in enumerate(employee_profiles['EmployeeNumber'])}
+    feature_index = {col: j for j, col in enumerate(feature_cols)}
     
-    # Create DataFrame
-    profiles_df = pd.DataFrame(employee_profiles)
+    return profile_matrix, employee_index, feature_index
+
+
+def build_shift_feature_columns(feature_index: Dict[str, int], shifts: pd.DataFrame) -> np.ndarray:
+    """
+    Resolve each shift's feature values to profile-matrix columns, one per
+    preference dimension (in PROFILE_DIMENSIONS order).
     
-    return profiles_df
+    Args:
+        feature_index: Preference column name -> column in profile_matrix
+        shifts: DataFrame with shift features (from extract_shift_features)
+        
+    Returns:
+        int array of shape (n_shifts, n_dimensions); -1 marks a feature value
+        never seen in history, which contributes nothing to the score
+    """
+    shift_cols = np.empty((len(shifts), len(PROFILE_DIMENSIONS)), dtype=np.intp)
+    
+    for k, (col, prefix, _) in enumerate(PROFILE_DIMENSIONS):
+        values = shifts[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Shift categories: use the integer codes directly (no string comparisons)
+            unique_values = values.cat.categories
+            inverse = values.cat.codes.to_numpy()
+        else:
+            if col in ('DayNum', 'JobNumber'):
+                values = values.astype(int)
+            unique_values, inverse = np.unique(values.to_numpy(), return_inverse=True)
+        
+        # Resolve each distinct value to its profile column once, then broadcast
+        # (trailing -1 sends missing categorical values, code -1, to "unseen")
+        value_cols = np.array(
+            [feature_index.get(f'{prefix}{value}_Prob', -1) for value in unique_values] + [-1],
+            dtype=np.intp
+        )
+        shift_cols[:, k] = value_cols[inverse]
+    
+    return shift_cols
 
 
-def get_compatibility_score(
-    employee_profile: pd.Series,
-    shift_day: int,
-    shift_time_category: str,
-    shift_duration_category: str,
-    shift_job: int,
-    shift_type: str
-) -> float:
+def score_shifts(profile_matrix: np.ndarray, shift_cols: np.ndarray) -> np.ndarray:
     """
-    Compute compatibility score for a single employee-shift pair.
+    Score every employee against every shift with the compiled scoring kernels.
     
     Args:
-        employee_profile: Row from employee profiles DataFrame
-        shift_day: DayNum of the shift
-        shift_time_category: Time category of the shift
-        shift_duration_category: Duration category of the shift
-        shift_job: JobNumber of the shift
-        shift_type: ShiftType of the shift
+        profile_matrix: Employee preference matrix (n_employees, n_features)
+        shift_cols: Shift feature columns (n_shifts, n_dimensions) from build_shift_feature_columns
         
     Returns:
-        Compatibility score (0.0 to 1.0)
+        Compatibility scores of shape (n_employees, n_shifts)
     """
-    weights = {
-        'day': 0.3,
-        'time': 0.25,
-        'duration': 0.15,
-        'job': 0.2,
-        'shift_type': 0.1
-    }
-    
-    score = 0.0
-    
-    # Day preference
-    day_col = f'Day{shift_day}_Prob'
-    if day_col in employee_profile:
-        score += weights['day'] * employee_profile[day_col]
-    
-    # Time preference
-    time_col = f'Time_{shift_time_category}_Prob'
-    if time_col in employee_profile:
-        score += weights['time'] * employee_profile[time_col]
-    
-    # Duration preference
-    duration_col = f'Duration_{shift_duration_category}_Prob'
-    if duration_col in employee_profile:
-        score += weights['duration'] * employee_profile[duration_col]
-    
-    # Job preference
-    job_col = f'Job_{shift_job}_Prob'
-    if job_col in employee_profile:
-        score += weights['job'] * employee_profile[job_col]
-    
-    # Shift type preference
-    shift_type_col = f'ShiftType_{shift_type}_Prob'
-    if shift_type_col in employee_profile:
-        score += weights['shift_type'] * employee_profile[shift_type_col]
-    
-    return score
+    # Imported lazily so importing this module doesn't pull in (and compile) numba kernels
+    from src.scoring_numba import score_all, score_matrix
+    
+    if shift_cols.shape[0] == 1:
+        # Single shift (the /assign path): serial kernel, safe under threaded servers
+        out = np.empty(profile_matrix.shape[0], dtype=np.float64)
+        score_all(profile_matrix, shift_cols[0], DIMENSION_WEIGHTS, out)
+        return out[:, np.newaxis]
+    
+    return score_matrix(profile_matrix, shift_cols, DIMENSION_WEIGHTS)
@@ -1,28 +1,111 @@
 """
 Data loader module for loading and extracting schedule data.
 """
+import os
+import hashlib
+import tempfile
 import pandas as pd
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
 from datetime import datetime
 
 
-def load_schedule_data(data_path: str = "data/Schedule_Historical_Data.csv") -> pd.DataFrame:
+# Columns used by preprocessing, profiling and optimization
+NEEDED_COLUMNS = [
+    'date',
+    'ScheduleDetailID',
+    'DayNum',
+    'EmployeeNumber',
+    'JobNumber',
+    'ShiftStartTime',
+    'ShiftEndTime'
+]
+
+
+def data_fingerprint(data_path: str) -> str:
+    """Return a short content hash of the data file."""
+    digest = hashlib.blake2b(digest_size=8)
+    with open(data_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _sidecar_paths(file_path: Path) -> List[Path]:
+    """Return every parquet sidecar cached for the CSV (any content hash)."""
+    return list(file_path.parent.glob(f'{file_path.stem}.*parquet'))
+
+
+def clear_data_cache(data_path: str = "data/Schedule_Historical_Data.csv") -> None:
+    """Delete the parquet sidecars cached next to the CSV."""
+    for path in _sidecar_paths(Path(data_path)):
+        path.unlink(missing_ok=True)
+
+
+def load_schedule_data(
+    data_path: str = "data/Schedule_Historical_Data.csv",
+    target_date: Optional[str] = None,
+    columns: Optional[List[str]] = NEEDED_COLUMNS,
+    fingerprint: Optional[str] = None
+) -> pd.DataFrame:
     """
     Load the schedule historical data CSV file.
     
+    The parsed frame (including a parsed 'date_parsed' column) is cached next to the
+    CSV as a parquet file named after the CSV's content hash, so it is rebuilt
+    whenever the CSV content changes (regardless of file times). Reads from the
+    cache only materialize the requested columns and snapshots up to target_date.
+    
     Args:
         data_path: Path to the CSV file
+        target_date: If given ('M/D/YYYY'), only load snapshots dated on or before it
+        columns: Columns to load (None loads all); 'date_parsed' is always included
+        fingerprint: Optional precomputed data_fingerprint of the CSV
         
     Returns:
-        DataFrame with raw schedule data
+        DataFrame with schedule data plus 'date_parsed'
     """
     file_path = Path(data_path)
     if not file_path.exists():
         raise FileNotFoundError(f"Data file not found: {data_path}")
+    if fingerprint is None:
+        fingerprint = data_fingerprint(data_path)
+    
+    if columns is not None:
+        columns = list(dict.fromkeys(list(columns) + ['date_parsed']))
+    filters = None
+    if target_date is not None:
+        filters = [('date_parsed', '<=', pd.to_datetime(target_date, format='%m/%d/%Y'))]
+    
+    cache_path = file_path.parent / f'{file_path.stem}.{fingerprint}.parquet'
+    if not cache_path.exists():
+        df = pd.read_csv(data_path)
+        df['date_parsed'] = pd.to_datetime(df['date'], format='%m/%d/%Y', cache=True)
+        
+        try:
+            # Sidecars of earlier CSV contents are never read again
+            for stale_path in _sidecar_paths(file_path):
+                stale_path.unlink(missing_ok=True)
+            
+            # Write to a temp file and rename, so an interrupted write never
+            # leaves a truncated cache behind
+            fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, prefix=f'.{cache_path.name}.', suffix='.tmp')
+            os.close(fd)
+            try:
+                df.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, cache_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            # Read-only data directory: filter in memory without the cache
+            print(f"Warning: could not write data cache {cache_path}: {e}")
+            if filters is not None:
+                df = df[df['date_parsed'] <= filters[0][2]]
+            return df if columns is None else df[columns]
     
-    df = pd.read_csv(data_path)
-    return df
+    # Projection and predicate pushdown: only needed columns / row groups are read
+    return pd.read_parquet(cache_path, columns=columns, filters=filters)
 
 
 def extract_latest_snapshot(df: pd.DataFrame, target_date: str = "10/8/2024") -> pd.DataFrame:
@@ -36,12 +119,14 @@ def extract_latest_snapshot(df: pd.DataFrame, target_date: str = "10/8/2024") ->
     Returns:
         DataFrame containing only the latest snapshot
     """
-    # Parse date column
-    df['date_parsed'] = pd.to_datetime(df['date'], format='%m/%d/%Y')
+    # Parse date column (already done by load_schedule_data)
+    if 'date_parsed' not in df.columns:
+        df['date_parsed'] = pd.to_datetime(df['date'], format='%m/%d/%Y', cache=True)
     target_datetime = pd.to_datetime(target_date, format='%m/%d/%Y')
     
-    # Filter for target date
-    latest_snapshot = df[df['date_parsed'] == target_datetime].copy()
+    # Filter for target date (no copy: callers must not mutate the result in place;
+    # preprocess_schedule copies before adding columns)
+    latest_snapshot = df[df['date_parsed'] == target_datetime]
     
     if latest_snapshot.empty:
         raise ValueError(f"No data found for target date: {target_date}")
@@ -60,13 +145,15 @@ def split_historical_and_latest(df: pd.DataFrame, target_date: str = "10/8/2024"
     Returns:
         Tuple of (historical_data, latest_snapshot)
     """
-    # Parse date column
-    df['date_parsed'] = pd.to_datetime(df['date'], format='%m/%d/%Y')
+    # Parse date column (already done by load_schedule_data)
+    if 'date_parsed' not in df.columns:
+        df['date_parsed'] = pd.to_datetime(df['date'], format='%m/%d/%Y', cache=True)
     target_datetime = pd.to_datetime(target_date, format='%m/%d/%Y')
     
-    # Split data
-    historical_data = df[df['date_parsed'] < target_datetime].copy()
-    latest_snapshot = df[df['date_parsed'] == target_datetime].copy()
+    # Split data (no copies: callers must not mutate the results in place;
+    # preprocess_schedule copies before adding columns)
+    historical_data = df[df['date_parsed'] < target_datetime]
+    latest_snapshot = df[df['date_parsed'] == target_datetime]
     
     if latest_snapshot.empty:
         raise ValueError(f"No data found for target date: {target_date}")
@@ -1,16 +1,104 @@
 """
 Optimization module for assigning employees to unfilled shifts using constrained optimization.
 """
+import os
+import hashlib
+import threading
+from collections import defaultdict
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple, Optional
-from pulp import LpMaximize, LpProblem, LpVariable, lpSum, LpStatus
-from compute_employee_profile import extract_shift_features, get_compatibility_score
+from pulp import LpMaximize, LpProblem, LpVariable, LpAffineExpression, LpStatus
+from pulp import HiGHS, HiGHS_CMD, GUROBI_CMD, PULP_CBC_CMD
+from scipy.optimize import linear_sum_assignment
+from src.compute_employee_profile import (
+    extract_shift_features,
+    build_profile_matrix,
+    build_shift_feature_columns,
+    score_shifts
+)
+
+# MIP backend: 'highs' (default), 'gurobi' or 'cbc'; override with SHIFT_SOLVER
+SOLVER = os.environ.get("SHIFT_SOLVER", "highs")
+SOLVER_TIME_LIMIT = 30  # seconds
+
+# Pairs scoring at or below this never get an assignment variable (a zero-score
+# assignment adds nothing to the objective)
+MIN_COMPATIBILITY_SCORE = 0.0
+
+# Memoized multi-shift compute_compatibility_matrix results, keyed by a hash of
+# the shift columns and profile matrix; clear with clear_compatibility_cache().
+# Guarded by _COMPATIBILITY_CACHE_LOCK (API requests run on threads)
+COMPATIBILITY_CACHE: Dict[Tuple[str, str], pd.DataFrame] = {}
+COMPATIBILITY_CACHE_SIZE = 32
+_COMPATIBILITY_CACHE_LOCK = threading.Lock()
+
+# Shift columns that determine compatibility scores (and the output rows)
+_COMPATIBILITY_SHIFT_COLUMNS = [
+    'ScheduleDetailID', 'DayNum', 'JobNumber', 'ShiftStartTime', 'ShiftEndTime', 'ShiftDurationHours'
+]
+
+
+def get_solver(name: str = SOLVER):
+    """
+    Return a quiet PuLP solver for the requested backend.
+    
+    Falls back to the CBC solver bundled with PuLP when the requested backend
+    is not installed (HiGHS needs highspy or the highs binary, Gurobi a license).
+    
+    Args:
+        name: 'highs', 'gurobi' or 'cbc'
+        
+    Returns:
+        PuLP solver instance
+    """
+    if name == 'highs':
+        for solver in (HiGHS(msg=False, timeLimit=SOLVER_TIME_LIMIT),
+                       HiGHS_CMD(msg=False, timeLimit=SOLVER_TIME_LIMIT)):
+            if solver.available():
+                return solver
+    elif name == 'gurobi':
+        solver = GUROBI_CMD(msg=False, timeLimit=SOLVER_TIME_LIMIT)
+        if solver.available():
+            return solver
+    
+    return PULP_CBC_CMD(msg=False, threads=os.cpu_count())
+
+
+def clear_compatibility_cache() -> None:
+    """Drop all memoized compute_compatibility_matrix results."""
+    with _COMPATIBILITY_CACHE_LOCK:
+        COMPATIBILITY_CACHE.clear()
+
+
+def profile_matrix_digest(profile_matrix: Tuple[np.ndarray, Dict[int, int], Dict[str, int]]) -> str:
+    """
+    Return a content hash of a build_profile_matrix result.
+    
+    Hashes the whole matrix, so compute it once per profile matrix and pass it
+    to compute_compatibility_matrix rather than per call.
+    """
+    matrix, employee_index, feature_index = profile_matrix
+    
+    digest = hashlib.blake2b(matrix.tobytes(), digest_size=16)
+    digest.update(np.fromiter(employee_index.keys(), dtype=np.int64, count=len(employee_index)).tobytes())
+    digest.update('\0'.join(feature_index).encode())
+    
+    return digest.hexdigest()
+
+
+def _shift_digest(unfilled_shifts: pd.DataFrame) -> str:
+    """Return a content hash of the shift columns that drive scoring."""
+    shift_columns = [col for col in _COMPATIBILITY_SHIFT_COLUMNS if col in unfilled_shifts.columns]
+    shift_hash = pd.util.hash_pandas_object(unfilled_shifts[shift_columns], index=False)
+    return hashlib.blake2b(shift_hash.to_numpy().tobytes(), digest_size=16).hexdigest()
 
 
 def compute_compatibility_matrix(
     unfilled_shifts: pd.DataFrame,
-    employee_profiles: pd.DataFrame
+    employee_profiles: pd.DataFrame,
+    profile_matrix: Optional[Tuple[np.ndarray, Dict[int, int], Dict[str, int]]] = None,
+    profile_digest: Optional[str] = None
 ) -> pd.DataFrame:
     """
     Compute compatibility scores for all employee-shift pairs.
@@ -18,44 +106,56 @@ def compute_compatibility_matrix(
     Args:
         unfilled_shifts: DataFrame with unfilled shifts (must have shift features)
         employee_profiles: DataFrame with employee profiles
+        profile_matrix: Optional precomputed (matrix, employee_index, feature_index) from
+                        build_profile_matrix; built from employee_profiles if omitted
+        profile_digest: Optional profile_matrix_digest of profile_matrix (hashed here if omitted)
         
     Returns:
         DataFrame with columns: EmployeeNumber, ScheduleDetailID, DayNum, CompatibilityScore
+        (multi-shift results are memoized in COMPATIBILITY_CACHE; callers must not mutate it)
     """
-    unfilled_shifts = extract_shift_features(unfilled_shifts.copy())
+    if profile_matrix is None:
+        profile_matrix = build_profile_matrix(employee_profiles)
+    matrix, employee_index, feature_index = profile_matrix
+    
+    # Reuse the result of an earlier call with identical shifts and profiles.
+    # Single shifts (the /assign path) are cheaper to score than to hash
+    cache_key = None
+    if len(unfilled_shifts) > 1:
+        if profile_digest is None:
+            profile_digest = profile_matrix_digest(profile_matrix)
+        cache_key = (_shift_digest(unfilled_shifts), profile_digest)
+        with _COMPATIBILITY_CACHE_LOCK:
+            cached = COMPATIBILITY_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
     
-    compatibility_scores = []
+    unfilled_shifts = extract_shift_features(unfilled_shifts.copy())
     
-    for _, shift in unfilled_shifts.iterrows():
-        shift_day = int(shift['DayNum'])
-        shift_time_cat = shift['ShiftTimeCategory']
-        shift_duration_cat = shift['ShiftDurationCategory']
-        shift_job = int(shift['JobNumber'])
-        shift_type = shift['ShiftType']
-        shift_id = (int(shift['ScheduleDetailID']), shift_day)
-        
-        for _, emp_profile in employee_profiles.iterrows():
-            emp_num = int(emp_profile['EmployeeNumber'])
-            
-            # Compute compatibility score
-            score = get_compatibility_score(
-                emp_profile,
-                shift_day,
-                shift_time_cat,
-                shift_duration_cat,
-                shift_job,
-                shift_type
-            )
-            
-            compatibility_scores.append({
-                'EmployeeNumber': emp_num,
-                'ScheduleDetailID': shift['ScheduleDetailID'],
-                'DayNum': shift_day,
-                'CompatibilityScore': score,
-                'ShiftDurationHours': shift['ShiftDurationHours']
-            })
-    
-    return pd.DataFrame(compatibility_scores)
+    # Compiled kernel scores every employee against every shift
+    shift_cols = build_shift_feature_columns(feature_index, unfilled_shifts)
+    scores = score_shifts(matrix, shift_cols)
+    
+    # Long-form output (shift-major, employees in profile order), built column-wise
+    n_employees, n_shifts = scores.shape
+    employee_numbers = np.fromiter(employee_index.keys(), dtype=np.int64, count=n_employees)
+    compatibility_scores = {
+        'EmployeeNumber': np.tile(employee_numbers, n_shifts),
+        'ScheduleDetailID': np.repeat(unfilled_shifts['ScheduleDetailID'].to_numpy(), n_employees),
+        'DayNum': np.repeat(unfilled_shifts['DayNum'].to_numpy().astype(np.int64), n_employees),
+        'CompatibilityScore': scores.T.ravel()
+    }
+    
+    compatibility_df = pd.DataFrame(compatibility_scores)
+    
+    # Bounded cache: drop the oldest entry (dicts keep insertion order)
+    if cache_key is not None:
+        with _COMPATIBILITY_CACHE_LOCK:
+            if len(COMPATIBILITY_CACHE) >= COMPATIBILITY_CACHE_SIZE:
+                del COMPATIBILITY_CACHE[next(iter(COMPATIBILITY_CACHE))]
+            COMPATIBILITY_CACHE[cache_key] = compatibility_df
+    
+    return compatibility_df
 
 
 def group_shifts_by_week(shifts: pd.DataFrame) -> Dict[int, List[Tuple[int, int]]]:
@@ -76,18 +176,115 @@ def group_shifts_by_week(shifts: pd.DataFrame) -> Dict[int, List[Tuple[int, int]
     week_id = 0
     
     shift_list = []
-    for _, shift in shifts.iterrows():
-        shift_id = (int(shift['ScheduleDetailID']), int(shift['DayNum']))
+    for shift in shifts.itertuples(index=False):
+        shift_id = (int(shift.ScheduleDetailID), int(shift.DayNum))
         shift_list.append(shift_id)
     
     week_shifts[week_id] = shift_list
     return week_shifts
 
 
+def aggregate_filled_shifts(
+    filled_shifts: pd.DataFrame
+) -> Tuple[Dict[Tuple[int, int], float], Dict[Tuple[int, int], set], Dict[Tuple[int, int], int]]:
+    """
+    Aggregate filled shifts into per-employee workload lookups.
+    All shifts are assumed to be in week 0 (single scheduling week).
+    
+    Args:
+        filled_shifts: DataFrame with filled shifts (must have EmployeeNumber and DayNum;
+                       ShiftDurationHours defaults to 8 hours when missing)
+        
+    Returns:
+        Tuple of (employee_week_hours, employee_week_days, employee_day_shifts):
+        - employee_week_hours: (emp, week) -> hours
+        - employee_week_days: (emp, week) -> set of days
+        - employee_day_shifts: (emp, day) -> count
+    """
+    week = 0
+    
+    filled_shifts = filled_shifts[filled_shifts['EmployeeNumber'].notna()]
+    employees = filled_shifts['EmployeeNumber'].astype(int)
+    days = filled_shifts['DayNum'].astype(int)
+    if 'ShiftDurationHours' in filled_shifts.columns:
+        durations = filled_shifts['ShiftDurationHours']
+    else:
+        durations = pd.Series(8.0, index=filled_shifts.index)
+    
+    hours_by_employee = durations.groupby(employees).sum()
+    days_by_employee = days.groupby(employees).agg(set)
+    shifts_by_employee_day = filled_shifts.groupby([employees, days]).size()
+    
+    employee_week_hours = {(emp, week): hours for emp, hours in hours_by_employee.items()}
+    employee_week_days = {(emp, week): emp_days for emp, emp_days in days_by_employee.items()}
+    employee_day_shifts = {(emp, day): count for (emp, day), count in shifts_by_employee_day.items()}
+    
+    return employee_week_hours, employee_week_days, employee_day_shifts
+
+
+def solve_matching_assignment(
+    shift_ids: List[Tuple[int, int]],
+    valid_employees: List[int],
+    compatibility: np.ndarray,
+    shift_durations: Dict[Tuple[int, int], float],
+    employee_week_hours: Dict[Tuple[int, int], float],
+    employee_week_days: Dict[Tuple[int, int], set],
+    employee_day_shifts: Dict[Tuple[int, int], int]
+) -> Dict[Tuple[int, int], int]:
+    """
+    Solve the assignment as a maximum-weight bipartite matching.
+    
+    Only exact when every unfilled shift falls on the same day: the one shift
+    per day limit then means each employee takes at most one of them, so the
+    weekly hours and work days limits can be checked per employee-shift pair.
+    
+    Args:
+        shift_ids: (ScheduleDetailID, DayNum) of each unfilled shift
+        valid_employees: Employees eligible for new assignments
+        compatibility: Scores of shape (len(valid_employees), len(shift_ids))
+        shift_durations: shift_id -> duration in hours
+        employee_week_hours: (employee, week) -> hours already scheduled
+        employee_week_days: (employee, week) -> set of days already worked
+        employee_day_shifts: (employee, day) -> shifts already scheduled that day
+        
+    Returns:
+        Dictionary mapping (ScheduleDetailID, DayNum) to EmployeeNumber
+    """
+    week = 0
+    weights = np.zeros((len(valid_employees), len(shift_ids)))
+    
+    for i, emp in enumerate(valid_employees):
+        current_hours = employee_week_hours.get((emp, week), 0)
+        worked_days = employee_week_days.get((emp, week), set())
+        
+        for j, shift_id in enumerate(shift_ids):
+            day = shift_id[1]
+            feasible = (
+                current_hours + shift_durations[shift_id] <= 40 and
+                len(worked_days | {day}) <= 5 and
+                employee_day_shifts.get((emp, day), 0) == 0
+            )
+            # Infeasible pairs get weight 0 and are dropped below; zero-score pairs
+            # add nothing to the objective, so the LP never needs them either
+            if feasible:
+                weights[i, j] = max(compatibility[i, j], 0.0)
+    
+    row_ind, col_ind = linear_sum_assignment(weights, maximize=True)
+    
+    assignments = {}
+    for i, j in zip(row_ind, col_ind):
+        if weights[i, j] > 0:
+            assignments[shift_ids[j]] = valid_employees[i]
+    
+    return assignments
+
+
 def solve_assignment(
     unfilled_shifts: pd.DataFrame,
     employee_profiles: pd.DataFrame,
-    filled_shifts: pd.DataFrame
+    filled_shifts: pd.DataFrame,
+    profile_matrix: Optional[Tuple[np.ndarray, Dict[int, int], Dict[str, int]]] = None,
+    solver_name: str = SOLVER
 ) -> Dict[Tuple[int, int], int]:
     """
     Solve the optimization problem to assign employees to unfilled shifts.
@@ -96,61 +293,28 @@ def solve_assignment(
         unfilled_shifts: DataFrame with unfilled shifts
         employee_profiles: DataFrame with employee profiles
         filled_shifts: DataFrame with already filled shifts (for constraint checking)
+        profile_matrix: Optional precomputed output of build_profile_matrix for employee_profiles
+        solver_name: MIP backend for multi-day problems ('highs', 'gurobi' or 'cbc')
         
     Returns:
         Dictionary mapping (ScheduleDetailID, DayNum) to EmployeeNumber
     """
-    # Compute compatibility matrix
-    compatibility_df = compute_compatibility_matrix(unfilled_shifts, employee_profiles)
-    
     # Get unique employees and shifts
     employees = sorted(employee_profiles['EmployeeNumber'].astype(int).unique())
-    shift_ids = []
-    for _, shift in unfilled_shifts.iterrows():
-        shift_id = (int(shift['ScheduleDetailID']), int(shift['DayNum']))
-        shift_ids.append(shift_id)
+    shift_ids = list(zip(
+        unfilled_shifts['ScheduleDetailID'].astype(int).tolist(),
+        unfilled_shifts['DayNum'].astype(int).tolist()
+    ))
     
     # Create shift lookup for duration
-    shift_durations = {}
-    for _, shift in unfilled_shifts.iterrows():
-        shift_id = (int(shift['ScheduleDetailID']), int(shift['DayNum']))
-        shift_durations[shift_id] = shift['ShiftDurationHours']
-    
-    # Create compatibility lookup
-    compatibility = {}
-    for _, row in compatibility_df.iterrows():
-        emp = int(row['EmployeeNumber'])
-        shift_id = (int(row['ScheduleDetailID']), int(row['DayNum']))
-        compatibility[(emp, shift_id)] = row['CompatibilityScore']
+    shift_durations = dict(zip(shift_ids, unfilled_shifts['ShiftDurationHours'].tolist()))
     
     # Group shifts by week (for now, all in same week)
     week_shifts = group_shifts_by_week(unfilled_shifts)
     
     # Calculate current assignments for constraint checking
     # For filled shifts, calculate hours and days per employee per week
-    employee_week_hours = {}  # (emp, week) -> hours
-    employee_week_days = {}   # (emp, week) -> set of days
-    employee_day_shifts = {}  # (emp, day) -> count
-    
-    for _, shift in filled_shifts.iterrows():
-        if pd.notna(shift['EmployeeNumber']):
-            emp = int(shift['EmployeeNumber'])
-            day = int(shift['DayNum'])
-            week = 0  # All in same week for now
-            duration = shift.get('ShiftDurationHours', 8.0)
-            
-            # Update hours
-            key = (emp, week)
-            employee_week_hours[key] = employee_week_hours.get(key, 0) + duration
-            
-            # Update days
-            if key not in employee_week_days:
-                employee_week_days[key] = set()
-            employee_week_days[key].add(day)
-            
-            # Update daily shifts
-            day_key = (emp, day)
-            employee_day_shifts[day_key] = employee_day_shifts.get(day_key, 0) + 1
+    employee_week_hours, employee_week_days, employee_day_shifts = aggregate_filled_shifts(filled_shifts)
     
     # Filter out employees who already violate constraints
     # These employees cannot be assigned any more shifts
@@ -158,6 +322,9 @@ def solve_assignment(
     excluded_employees = []
     exclusion_reasons = {'hours': 0, 'days': 0, 'daily': 0}
     
+    # Employees with any day holding > 1 shift (one pass over the daily counts)
+    daily_violators = {e for (e, d), count in employee_day_shifts.items() if count > 1}
+    
     for emp in employees:
         week = 0
         key = (emp, week)
@@ -167,9 +334,7 @@ def solve_assignment(
         current_days = len(employee_week_days.get(key, set()))
         
         # Check if employee has any day with > 1 shift
-        has_daily_violation = any(
-            count > 1 for (e, d), count in employee_day_shifts.items() if e == emp
-        )
+        has_daily_violation = emp in daily_violators
         
         # Exclude if already at or over constraint limits
         # Employees at the limit (40 hrs, 5 days) cannot take more shifts
@@ -195,23 +360,80 @@ def solve_assignment(
         print("  No valid employees available for assignment (all violate constraints)")
         return {}
     
+    if len(shift_ids) == 0:
+        return {}
+    
+    # Compute compatibility matrix for valid employees only (excluded employees
+    # can't take any shift, so scoring them is wasted work)
+    if profile_matrix is None:
+        profile_matrix = build_profile_matrix(employee_profiles)
+    
+    # Memo key for multi-shift problems: hash the full matrix once, then derive
+    # the narrowed matrix's digest from the selected rows instead of rehashing it
+    profile_digest = profile_matrix_digest(profile_matrix) if len(shift_ids) > 1 else None
+    
+    if len(valid_employees) < len(employees):
+        matrix, employee_index, feature_index = profile_matrix
+        valid_rows = np.array([employee_index[emp] for emp in valid_employees], dtype=np.int64)
+        profile_matrix = (
+            matrix[valid_rows],
+            {emp: i for i, emp in enumerate(valid_employees)},
+            feature_index
+        )
+        employee_profiles = employee_profiles[employee_profiles['EmployeeNumber'].isin(valid_employees)]
+        if profile_digest is not None:
+            profile_digest = hashlib.blake2b(
+                profile_digest.encode() + valid_rows.tobytes(), digest_size=16
+            ).hexdigest()
+    compatibility_df = compute_compatibility_matrix(
+        unfilled_shifts, employee_profiles, profile_matrix, profile_digest
+    )
+    
+    # Dense compatibility lookup: compatibility[i, j] scores valid_employees[i]
+    # against shift_ids[j] (pairs missing from compatibility_df score 0)
+    employee_pos = pd.Series(np.arange(len(valid_employees)), index=valid_employees)
+    rows = employee_pos.reindex(compatibility_df['EmployeeNumber'].astype(int)).to_numpy()
+    cols = pd.MultiIndex.from_tuples(shift_ids).get_indexer(
+        pd.MultiIndex.from_arrays([compatibility_df['ScheduleDetailID'], compatibility_df['DayNum']])
+    )
+    known = ~np.isnan(rows) & (cols >= 0)
+    compatibility = np.zeros((len(valid_employees), len(shift_ids)))
+    compatibility[rows[known].astype(np.intp), cols[known]] = compatibility_df['CompatibilityScore'].to_numpy()[known]
+    
+    # All shifts on one day (always true for the single-cell API): solve as a
+    # bipartite matching instead of a MIP
+    if len(set(shift_id[1] for shift_id in shift_ids)) == 1:
+        return solve_matching_assignment(
+            shift_ids,
+            valid_employees,
+            compatibility,
+            shift_durations,
+            employee_week_hours,
+            employee_week_days,
+            employee_day_shifts
+        )
+    
     # Create optimization problem
     prob = LpProblem("Shift_Assignment", LpMaximize)
     
     # Decision variables: x[emp, shift_id] = 1 if assigned, 0 otherwise
-    # Only create variables for valid employees
-    x = {}
-    for emp in valid_employees:
-        for shift_id in shift_ids:
-            x[(emp, shift_id)] = LpVariable(f"x_{emp}_{shift_id[0]}_{shift_id[1]}", cat='Binary')
+    # Only create variables for valid employees and pairs that can improve the objective
+    emp_rows, shift_cols = np.nonzero(compatibility > MIN_COMPATIBILITY_SCORE)
+    x = LpVariable.dicts(
+        "x",
+        [(valid_employees[i], shift_ids[j]) for i, j in zip(emp_rows, shift_cols)],
+        cat='Binary'
+    )
     
     # Objective: Maximize total compatibility
-    prob += lpSum([compatibility.get((emp, shift_id), 0.0) * x[(emp, shift_id)]
-                   for emp in valid_employees for shift_id in shift_ids])
+    prob += LpAffineExpression(zip(x.values(), compatibility[emp_rows, shift_cols].tolist()))
     
     # Constraint 1: Each shift assigned to at most one employee
+    shift_vars = defaultdict(list)
+    for (emp, shift_id), var in x.items():
+        shift_vars[shift_id].append((var, 1))
     for shift_id in shift_ids:
-        prob += lpSum([x[(emp, shift_id)] for emp in valid_employees]) <= 1
+        prob += LpAffineExpression(shift_vars[shift_id]) <= 1
     
     # Constraint 2: Weekly hours limit (40 hours per week)
     for emp in valid_employees:
@@ -220,63 +442,72 @@ def solve_assignment(
             current_hours = employee_week_hours.get((emp, week), 0)
             
             # Hours from new assignments
-            new_hours = lpSum([shift_durations[shift_id] * x[(emp, shift_id)]
-                              for shift_id in week_shift_list if shift_id in shift_ids])
+            new_hours = LpAffineExpression([(x[(emp, shift_id)], shift_durations[shift_id])
+                                            for shift_id in week_shift_list if (emp, shift_id) in x])
             
             prob += current_hours + new_hours <= 40
     
+    # Group unfilled shifts by day once (per week for Constraint 3, overall for Constraint 4)
+    def group_by_day(shift_list):
+        shifts_by_day = defaultdict(list)
+        for shift_id in shift_list:
+            shifts_by_day[shift_id[1]].append(shift_id)  # DayNum is second element
+        return shifts_by_day
+    
+    week_shifts_by_day = {week: group_by_day(week_shift_list) for week, week_shift_list in week_shifts.items()}
+    shifts_by_day = group_by_day(shift_ids)
+    
     # Constraint 3: Work days limit (5 days per week)
     # For each employee and week, count unique days worked
     for emp in valid_employees:
-        for week, week_shift_list in week_shifts.items():
+        for week, week_days in week_shifts_by_day.items():
             # Current days from filled shifts
             current_days = len(employee_week_days.get((emp, week), set()))
             
-            # Get unique days in unfilled shifts for this week
-            days_in_week = set()
-            for shift_id in week_shift_list:
-                if shift_id in shift_ids:
-                    days_in_week.add(shift_id[1])  # DayNum is second element
+            # Unfilled shifts this employee could take on each day of this week
+            emp_shifts_by_day = {}
+            for day, day_shifts in week_days.items():
+                emp_day_shifts = [shift_id for shift_id in day_shifts if (emp, shift_id) in x]
+                if emp_day_shifts:
+                    emp_shifts_by_day[day] = emp_day_shifts
+            
+            # The daily cap (Constraint 4) allows at most one new day per unfilled
+            # day, so the limit can only bind when those could push past 5 days
+            if current_days + len(emp_shifts_by_day) <= 5:
+                continue
             
             # For each unique day, create a binary variable indicating if employee works that day
             day_vars = {}
-            for day in days_in_week:
+            for day, shifts_on_day in emp_shifts_by_day.items():
                 day_vars[day] = LpVariable(f"day_{emp}_{week}_{day}", cat='Binary')
                 # Link day variable to shift assignments: if any shift on this day is assigned, day_var = 1
-                shifts_on_day = [shift_id for shift_id in week_shift_list 
-                               if shift_id in shift_ids and shift_id[1] == day]
-                if shifts_on_day:
-                    for shift_id in shifts_on_day:
-                        prob += day_vars[day] >= x[(emp, shift_id)]
-                    prob += day_vars[day] <= lpSum([x[(emp, shift_id)] for shift_id in shifts_on_day])
+                for shift_id in shifts_on_day:
+                    prob += day_vars[day] >= x[(emp, shift_id)]
+                prob += day_vars[day] <= LpAffineExpression([(x[(emp, shift_id)], 1) for shift_id in shifts_on_day])
             
             # Total days worked (current + new) <= 5
-            if day_vars:
-                prob += current_days + lpSum(day_vars.values()) <= 5
-            else:
-                prob += current_days <= 5
+            prob += current_days + LpAffineExpression([(var, 1) for var in day_vars.values()]) <= 5
     
     # Constraint 4: Daily shift limit (1 shift per day)
     # Group shifts by employee and day, then sum all assignments for that day
     for emp in valid_employees:
-        # Get all unique days in unfilled shifts
-        days_with_shifts = set(shift_id[1] for shift_id in shift_ids)
-        
-        for day in days_with_shifts:
+        for day, day_shifts in shifts_by_day.items():
             day_key = (emp, day)
             
             # Current shifts on this day from filled shifts
             current_shifts = employee_day_shifts.get(day_key, 0)
             
             # All new shifts on this day for this employee
-            shifts_on_day = [shift_id for shift_id in shift_ids if shift_id[1] == day]
-            new_shifts_sum = lpSum([x[(emp, shift_id)] for shift_id in shifts_on_day])
+            shifts_on_day = [shift_id for shift_id in day_shifts if (emp, shift_id) in x]
+            if not shifts_on_day:
+                continue
+            new_shifts_sum = LpAffineExpression([(x[(emp, shift_id)], 1) for shift_id in shifts_on_day])
             
             # Total shifts (current + new) <= 1
             prob += current_shifts + new_shifts_sum <= 1
     
     # Solve
-    status = prob.solve()
+    status = prob.solve(get_solver(solver_name))
     
     # Check if solution was found
     if status != 1:  # 1 = Optimal, -1 = Infeasible, -2 = Unbounded, etc.
@@ -286,16 +517,18 @@ def solve_assignment(
             return {}
     
     # Extract solution
+    # Binary variables: read all values at once and keep those > 0.5 (unset counts as 0)
+    keys = list(x.keys())
+    var_values = np.array([var.varValue or 0.0 for var in x.values()])
+    
     assignments = {}
-    for emp in valid_employees:
-        for shift_id in shift_ids:
-            var_value = x[(emp, shift_id)].varValue
-            if var_value is not None and var_value > 0.5:  # Binary variable, check > 0.5
-                if shift_id not in assignments:  # Only assign once per shift
-                    assignments[shift_id] = emp
-                else:
-                    # This shouldn't happen, but log if it does
-                    print(f"  Warning: Shift {shift_id} already assigned to {assignments[shift_id]}, skipping assignment to {emp}")
+    for k in np.flatnonzero(var_values > 0.5):
+        emp, shift_id = keys[k]
+        if shift_id not in assignments:  # Only assign once per shift
+            assignments[shift_id] = emp
+        else:
+            # This shouldn't happen, but log if it does
+            print(f"  Warning: Shift {shift_id} already assigned to {assignments[shift_id]}, skipping assignment to {emp}")
     
     return assignments
 
@@ -338,18 +571,15 @@ def fill_unfilled_shifts(
         return result
     
     # Apply assignments (only to first row per ScheduleDetailID/DayNum to avoid duplicates)
-    for shift_id, emp_num in assignments.items():
-        schedule_detail_id, day_num = shift_id
-        # Find unfilled rows matching this shift
-        mask = (
-            (result['ScheduleDetailID'] == schedule_detail_id) & 
-            (result['DayNum'] == day_num) & 
-            (result['IsUnfilled'])
-        )
-        # Only update the first matching row to avoid duplicate assignments
-        matching_indices = result[mask].index
-        if len(matching_indices) > 0:
-            result.loc[matching_indices[0], 'EmployeeNumber'] = float(emp_num)
-            result.loc[matching_indices[0], 'IsUnfilled'] = False
+    assigned = pd.DataFrame(
+        [(schedule_detail_id, day_num, emp_num) for (schedule_detail_id, day_num), emp_num in assignments.items()],
+        columns=['ScheduleDetailID', 'DayNum', 'AssignedEmployee']
+    )
+    first_unfilled = result.loc[result['IsUnfilled'], ['ScheduleDetailID', 'DayNum']].drop_duplicates(keep='first')
+    first_unfilled['Row'] = first_unfilled.index
+    matched = first_unfilled.merge(assigned, on=['ScheduleDetailID', 'DayNum'])
+    
+    result.loc[matched['Row'], 'EmployeeNumber'] = matched['AssignedEmployee'].astype(int).to_numpy()
+    result.loc[matched['Row'], 'IsUnfilled'] = False
     
     return result
@@ -2,8 +2,27 @@
 Preprocessing module for cleaning and validating schedule data.
 """
 import pandas as pd
+import numpy as np
 from typing import Dict, Any
-from datetime import datetime, timedelta
+
+
+def shift_duration_hours(start_times: pd.Series, end_times: pd.Series) -> np.ndarray:
+    """
+    Compute shift durations from HH:MM:SS start and end times.
+    A shift whose end time is earlier than its start time spans midnight.
+    
+    Args:
+        start_times: Shift start times (HH:MM:SS strings)
+        end_times: Shift end times (HH:MM:SS strings)
+        
+    Returns:
+        Array of durations in hours
+    """
+    start = pd.to_datetime(start_times, format='%H:%M:%S')
+    end = pd.to_datetime(end_times, format='%H:%M:%S')
+    delta = (end - start).dt.total_seconds().to_numpy()
+    delta = np.where(delta < 0, delta + 86400, delta)
+    return delta / 3600.0
 
 
 def handle_midnight_shifts(df: pd.DataFrame) -> pd.DataFrame:
@@ -19,27 +38,8 @@ def handle_midnight_shifts(df: pd.DataFrame) -> pd.DataFrame:
     """
     df = df.copy()
     
-    # Parse shift times
-    df['ShiftStartTime_parsed'] = pd.to_datetime(df['ShiftStartTime'], format='%H:%M:%S').dt.time
-    df['ShiftEndTime_parsed'] = pd.to_datetime(df['ShiftEndTime'], format='%H:%M:%S').dt.time
-    
     # Calculate shift duration in hours
-    def calculate_hours(row):
-        start = row['ShiftStartTime_parsed']
-        end = row['ShiftEndTime_parsed']
-        
-        # Convert to datetime for calculation
-        start_dt = datetime.combine(datetime.today(), start)
-        end_dt = datetime.combine(datetime.today(), end)
-        
-        # If end time is earlier than start, it spans midnight
-        if end_dt < start_dt:
-            end_dt += timedelta(days=1)
-        
-        duration = (end_dt - start_dt).total_seconds() / 3600
-        return duration
-    
-    df['ShiftDurationHours'] = df.apply(calculate_hours, axis=1)
+    df['ShiftDurationHours'] = shift_duration_hours(df['ShiftStartTime'], df['ShiftEndTime'])
     
     return df
 
@@ -113,6 +113,31 @@ def parse_scheduling_weeks(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def downcast_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Narrow dtypes to reduce the memory footprint of preprocessed (and cached)
+    schedule data.
+    
+    Args:
+        df: Preprocessed DataFrame
+        
+    Returns:
+        DataFrame with narrower dtypes
+    """
+    df = df.copy()
+    
+    df['DayNum'] = df['DayNum'].astype('int8')
+    df['JobNumber'] = df['JobNumber'].astype('int32')
+    df['EmployeeNumber'] = df['EmployeeNumber'].astype('Int32')  # nullable: NA marks unfilled
+    df['ShiftDurationHours'] = df['ShiftDurationHours'].astype('float32')
+    df['DayOfWeek'] = pd.Categorical(
+        df['DayOfWeek'],
+        categories=['Friday', 'Saturday', 'Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday']
+    )
+    
+    return df
+
+
 def validate_data(df: pd.DataFrame) -> Dict[str, Any]:
     """
     Validate the preprocessed data and return validation results.
@@ -161,4 +186,7 @@ def preprocess_schedule(df: pd.DataFrame, deduplicate_by_date: bool = True) -> p
     # Step 4: Parse scheduling weeks
     df = parse_scheduling_weeks(df)
     
+    # Step 5: Downcast dtypes
+    df = downcast_dtypes(df)
+    
     return df
@@ -0,0 +1,72 @@
+"""
+Numba-compiled scoring kernels for the compatibility hot path.
+
+Shifts are described by the profile-matrix column of each preference dimension
+(-1 when the value never occurs in the profiles), so a score is a weighted
+gather of at most five profile entries rather than a full dot product.
+"""
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True, fastmath=True)
+def score_all(profile_matrix: np.ndarray, shift_cols: np.ndarray, weights: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """
+    Score every employee against a single shift.
+    
+    Args:
+        profile_matrix: Employee preference matrix (n_employees, n_features)
+        shift_cols: Profile column per dimension for the shift (n_dimensions,)
+        weights: Weight per dimension (n_dimensions,)
+        out: Preallocated output array (n_employees,)
+        
+    Returns:
+        out, filled with one compatibility score per employee
+    """
+    for i in range(profile_matrix.shape[0]):
+        s = 0.0
+        for k in range(shift_cols.shape[0]):
+            col = shift_cols[k]
+            if col >= 0:
+                s += weights[k] * profile_matrix[i, col]
+        out[i] = s
+    return out
+
+
+@njit(cache=True, fastmath=True, parallel=True)
+def score_matrix(profile_matrix: np.ndarray, shift_cols: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Score every employee against every shift, in parallel over employees.
+    
+    Args:
+        profile_matrix: Employee preference matrix (n_employees, n_features)
+        shift_cols: Profile column per shift and dimension (n_shifts, n_dimensions)
+        weights: Weight per dimension (n_dimensions,)
+        
+    Returns:
+        Compatibility scores of shape (n_employees, n_shifts)
+    """
+    n_employees = profile_matrix.shape[0]
+    n_shifts = shift_cols.shape[0]
+    out = np.empty((n_employees, n_shifts), dtype=np.float64)
+    for i in prange(n_employees):
+        for j in range(n_shifts):
+            s = 0.0
+            for k in range(shift_cols.shape[1]):
+                col = shift_cols[j, k]
+                if col >= 0:
+                    s += weights[k] * profile_matrix[i, col]
+            out[i, j] = s
+    return out
+
+
+def _warmup():
+    """Compile (or load from the on-disk cache) both kernels for the production dtypes."""
+    profile_matrix = np.zeros((2, 2), dtype=np.float32)
+    shift_cols = np.array([[0, -1], [1, 0]], dtype=np.intp)
+    weights = np.ones(2, dtype=np.float64)
+    score_all(profile_matrix, shift_cols[0], weights, np.empty(2, dtype=np.float64))
+    score_matrix(profile_matrix, shift_cols, weights)
+
+
+_warmup()
@@ -2,8 +2,15 @@
 Validation module for checking constraints and computing compatibility scores.
 """
 import pandas as pd
+import numpy as np
 from typing import Dict, List, Tuple
-from compute_employee_profile import get_compatibility_score, extract_shift_features
+from src.compute_employee_profile import (
+    DIMENSION_WEIGHTS,
+    extract_shift_features,
+    build_profile_matrix,
+    build_shift_feature_columns
+)
+from src.optimizer import aggregate_filled_shifts
 
 
 def compute_assignment_compatibility(
@@ -20,42 +27,32 @@ def compute_assignment_compatibility(
     Returns:
         Mean compatibility score
     """
-    assignments = extract_shift_features(assignments.copy())
-    
-    compatibility_scores = []
-    
-    for _, shift in assignments.iterrows():
-        if pd.notna(shift['EmployeeNumber']):
-            emp_num = int(shift['EmployeeNumber'])
-            
-            # Find employee profile
-            emp_profile = employee_profiles[employee_profiles['EmployeeNumber'] == emp_num]
-            if len(emp_profile) == 0:
-                continue
-            
-            emp_profile = emp_profile.iloc[0]
-            
-            # Compute compatibility score
-            score = get_compatibility_score(
-                emp_profile,
-                int(shift['DayNum']),
-                shift['ShiftTimeCategory'],
-                shift['ShiftDurationCategory'],
-                int(shift['JobNumber']),
-                shift['ShiftType']
-            )
-            
-            compatibility_scores.append(score)
-    
-    if len(compatibility_scores) == 0:
+    assignments = assignments[assignments['EmployeeNumber'].notna()]
+    assignments = extract_shift_features(assignments)
+    
+    # Look up each assigned employee's profile row; employees without a profile are skipped
+    profile_matrix, employee_index, feature_index = build_profile_matrix(employee_profiles)
+    profile_rows = assignments['EmployeeNumber'].astype(int).map(employee_index)
+    has_profile = profile_rows.notna().to_numpy()
+    
+    if not has_profile.any():
         return 0.0
     
-    return sum(compatibility_scores) / len(compatibility_scores)
+    rows = profile_rows[has_profile].to_numpy(dtype=np.intp)
+    shift_cols = build_shift_feature_columns(feature_index, assignments[has_profile])
+    
+    # Gather each (employee, shift) preference per dimension; unseen features score 0
+    seen = shift_cols >= 0
+    probs = profile_matrix[rows[:, np.newaxis], np.where(seen, shift_cols, 0)]
+    compatibility_scores = np.where(seen, probs, 0.0) @ DIMENSION_WEIGHTS
+    
+    return float(compatibility_scores.mean())
 
 
-def validate_filled_shifts_constraints(filled_shifts: pd.DataFrame) -> Dict[str, any]:
+def _compute_constraint_violations(filled_shifts: pd.DataFrame) -> Dict[str, any]:
     """
-    Validate constraints on already-filled shifts (before optimization).
+    Aggregate filled shifts and check the weekly hours, work days and daily
+    shift limits (all shifts are assumed to be in week 0).
     
     Args:
         filled_shifts: DataFrame with filled shifts (must have EmployeeNumber, DayNum, ShiftDurationHours)
@@ -64,9 +61,9 @@ def validate_filled_shifts_constraints(filled_shifts: pd.DataFrame) -> Dict[str,
         Dictionary with validation results including violations
     """
     violations = {
-        'weekly_hours': [],
-        'work_days': [],
-        'daily_shifts': []
+        'weekly_hours': [],  # List of (employee, week, hours) violations
+        'work_days': [],      # List of (employee, week, days) violations
+        'daily_shifts': []    # List of (employee, day, count) violations
     }
     
     if len(filled_shifts) == 0:
@@ -76,31 +73,9 @@ def validate_filled_shifts_constraints(filled_shifts: pd.DataFrame) -> Dict[str,
             'total_violations': 0
         }
     
-    # Assume all shifts are in week 0 (single scheduling week)
-    week = 0
-    
-    employee_week_hours = {}
-    employee_week_days = {}
-    employee_day_shifts = {}
-    
-    for _, shift in filled_shifts.iterrows():
-        if pd.notna(shift['EmployeeNumber']):
-            emp = int(shift['EmployeeNumber'])
-            day = int(shift['DayNum'])
-            duration = shift.get('ShiftDurationHours', 8.0)
-            
-            # Update hours
-            key = (emp, week)
-            employee_week_hours[key] = employee_week_hours.get(key, 0) + duration
-            
-            # Update days
-            if key not in employee_week_days:
-                employee_week_days[key] = set()
-            employee_week_days[key].add(day)
-            
-            # Update daily shifts
-            day_key = (emp, day)
-            employee_day_shifts[day_key] = employee_day_shifts.get(day_key, 0) + 1
+    # For simplicity, assume all shifts are in week 0 (single scheduling week)
+    # In a full implementation, we'd group by actual scheduling weeks
+    employee_week_hours, employee_week_days, employee_day_shifts = aggregate_filled_shifts(filled_shifts)
     
     # Check constraints
     for (emp, w), hours in employee_week_hours.items():
@@ -146,6 +121,19 @@ def validate_filled_shifts_constraints(filled_shifts: pd.DataFrame) -> Dict[str,
     }
 
 
+def validate_filled_shifts_constraints(filled_shifts: pd.DataFrame) -> Dict[str, any]:
+    """
+    Validate constraints on already-filled shifts (before optimization).
+    
+    Args:
+        filled_shifts: DataFrame with filled shifts (must have EmployeeNumber, DayNum, ShiftDurationHours)
+        
+    Returns:
+        Dictionary with validation results including violations
+    """
+    return _compute_constraint_violations(filled_shifts)
+
+
 def validate_constraints(snapshot: pd.DataFrame) -> Dict[str, any]:
     """
     Validate that all scheduling constraints are satisfied.
@@ -156,87 +144,7 @@ def validate_constraints(snapshot: pd.DataFrame) -> Dict[str, any]:
     Returns:
         Dictionary with validation results including violations
     """
-    violations = {
-        'weekly_hours': [],  # List of (employee, week, hours) violations
-        'work_days': [],      # List of (employee, week, days) violations
-        'daily_shifts': []    # List of (employee, day, count) violations
-    }
-    
-    # Group by employee
-    filled_shifts = snapshot[snapshot['EmployeeNumber'].notna()].copy()
-    
-    if len(filled_shifts) == 0:
-        return {
-            'valid': True,
-            'violations': violations,
-            'total_violations': 0
-        }
-    
-    # For simplicity, assume all shifts are in week 0 (single scheduling week)
-    # In a full implementation, we'd group by actual scheduling weeks
-    week = 0
-    
-    employee_week_hours = {}  # (emp, week) -> hours
-    employee_week_days = {}   # (emp, week) -> set of days
-    employee_day_shifts = {}  # (emp, day) -> count
-    
-    for _, shift in filled_shifts.iterrows():
-        emp = int(shift['EmployeeNumber'])
-        day = int(shift['DayNum'])
-        duration = shift.get('ShiftDurationHours', 8.0)
-        
-        # Update hours
-        key = (emp, week)
-        employee_week_hours[key] = employee_week_hours.get(key, 0) + duration
-        
-        # Update days
-        if key not in employee_week_days:
-            employee_week_days[key] = set()
-        employee_week_days[key].add(day)
-        
-        # Update daily shifts
-        day_key = (emp, day)
-        employee_day_shifts[day_key] = employee_day_shifts.get(day_key, 0) + 1
-    
-    # Check constraints
-    for (emp, w), hours in employee_week_hours.items():
-        if hours > 40:
-            violations['weekly_hours'].append({
-                'employee': emp,
-                'week': w,
-                'hours': hours,
-                'limit': 40
-            })
+    # Only assigned shifts count toward the limits
+    filled_shifts = snapshot[snapshot['EmployeeNumber'].notna()]
     
-    for (emp, w), days in employee_week_days.items():
-        if len(days) > 5:
-            violations['work_days'].append({
-                'employee': emp,
-                'week': w,
-                'days': len(days),
-                'limit': 5
-            })
-    
-    for (emp, day), count in employee_day_shifts.items():
-        if count > 1:
-            violations['daily_shifts'].append({
-                'employee': emp,
-                'day': day,
-                'count': count,
-                'limit': 1
-            })
-    
-    total_violations = (
-        len(violations['weekly_hours']) +
-        len(violations['work_days']) +
-        len(violations['daily_shifts'])
-    )
-    
-    return {
-        'valid': total_violations == 0,
-        'violations': violations,
-        'total_violations': total_violations,
-        'employee_week_hours': employee_week_hours,
-        'employee_week_days': {k: len(v) for k, v in employee_week_days.items()},
-        'employee_day_shifts': employee_day_shifts
-    }
+    return _compute_constraint_violations(filled_shifts)